@@ -0,0 +1,14 @@
+# conftest.py
+from __future__ import annotations
+import pytest
+
+import database as db
+
+
+@pytest.fixture
+def tmp_db(tmp_path, monkeypatch):
+    # point the module at a fresh DB and skip real sleeps between retries
+    monkeypatch.setattr(db, "DB_PATH", tmp_path / "test.db")
+    monkeypatch.setattr(db, "_backoff", lambda attempt: 0)
+    db.init_db()
+    return db.DB_PATH
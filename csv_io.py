@@ -26,10 +26,9 @@ def export_to_csv(path: str) -> int:
 def import_expenses_from_csv(path: str, mode: str = "append") -> Tuple[int, int]:
 
     # mode: "append" or "upsert"
-    inserted = 0
-    updated = 0
+    rows: List[Dict] = []
 
-    # open the file, read the rows
+    # open the file, read and validate the rows before touching the DB
     with open(path, "r", newline="", encoding="utf-8") as f:
         reader = csv.DictReader(f)
         for row in reader:
@@ -43,16 +42,16 @@ def import_expenses_from_csv(path: str, mode: str = "append") -> Tuple[int, int]
             amount = validate_amount(row["amount"])
             validate_date(date)
             note = (row.get("note") or "").strip()
+            eid = (row.get("expense_id") or "").strip()
+
+            rows.append({
+                "expense_id": int(eid) if eid.isdigit() else None,
+                "name": name,
+                "amount": amount,
+                "category": category,
+                "note": note,
+                "date": date,
+            })
 
-            if mode == "upsert" and (row.get("expense_id") or "").strip().isdigit():
-                eid = int(row["expense_id"])
-                existing = db.get_expense_by_id(eid)
-                if existing:
-                    db.update_expense(eid, name, amount, category, note, date)
-                    updated += 1
-                    continue
-
-            db.add_expense(name, amount, category, note, date)
-            inserted += 1
-
-    return inserted, updated
\ No newline at end of file
+    # one transaction for the whole file: the write lock is taken once
+    return db.import_expenses(rows, upsert=(mode == "upsert"))
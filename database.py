@@ -1,21 +1,130 @@
 # database.py
 from __future__ import annotations
+import contextlib
+import os
+import random
 import sqlite3
+import time
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
 
 DB_PATH = Path("expenses.db")
 
+# Concurrency settings (several CLI processes may share the same file).
+# Each can be overridden from the environment or by assigning the module global.
+BUSY_TIMEOUT_MS = int(os.environ.get("EXPENSES_BUSY_TIMEOUT_MS", "5000"))
+# SQLite's own PASSIVE auto-checkpoint can't reset the WAL while readers are
+# always active, so writers also try a TRUNCATE checkpoint once the -wal file
+# grows past this many bytes (0 disables it).
+WAL_SIZE_LIMIT = int(os.environ.get("EXPENSES_WAL_SIZE_LIMIT", str(16 * 1024 * 1024)))
+WAL_CHECKPOINT_WAIT_MS = 200  # how long that checkpoint may wait for readers
+BUSY_RETRIES = int(os.environ.get("EXPENSES_BUSY_RETRIES", "5"))
+RETRY_BASE_DELAY = 0.05  # seconds
+RETRY_MAX_DELAY = 2.0    # seconds
+
+CHECKPOINT_MODES = ("PASSIVE", "FULL", "RESTART", "TRUNCATE")
+
 def _connect() -> sqlite3.Connection:
-    conn = sqlite3.connect(DB_PATH)
+    # isolation_level=None: we issue BEGIN/COMMIT ourselves (see _write)
+    conn = sqlite3.connect(DB_PATH, timeout=BUSY_TIMEOUT_MS / 1000, isolation_level=None)
     conn.row_factory = sqlite3.Row
     conn.execute("PRAGMA foreign_keys = ON;")
-    conn.execute("PRAGMA journal_mode = WAL;")
     return conn
 
+def _is_busy(err: sqlite3.OperationalError) -> bool:
+    msg = str(err).lower()
+    return "locked" in msg or "busy" in msg
+
+def _backoff(attempt: int) -> float:
+    # exponential backoff with full jitter
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * (2 ** attempt)))
+
+def _retry(op: Callable[[], T]) -> T:
+    # re-run op while SQLite reports busy/locked, up to BUSY_RETRIES times
+    attempt = 0
+    while True:
+        try:
+            return op()
+        except sqlite3.OperationalError as e:
+            if not _is_busy(e) or attempt >= BUSY_RETRIES:
+                raise
+        time.sleep(_backoff(attempt))
+        attempt += 1
+
+def _wal_path() -> Path:
+    return DB_PATH.with_name(DB_PATH.name + "-wal")
+
+def _maybe_truncate_wal(conn: sqlite3.Connection) -> None:
+    # best effort: a busy or failed checkpoint just leaves it for next time
+    if WAL_SIZE_LIMIT <= 0:
+        return
+    try:
+        if _wal_path().stat().st_size <= WAL_SIZE_LIMIT:
+            return
+        conn.execute(f"PRAGMA busy_timeout = {WAL_CHECKPOINT_WAIT_MS};")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE);").fetchone()
+    except (OSError, sqlite3.Error):
+        pass
+
+def _write(fn: Callable[[sqlite3.Connection], T]) -> T:
+    """Run fn inside a BEGIN IMMEDIATE transaction, retrying if the DB is busy."""
+    def _attempt() -> T:
+        conn = _connect()
+        try:
+            # take the write lock up front so we never fail mid-transaction
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(conn)
+                conn.execute("COMMIT")
+            except BaseException:
+                # a failing ROLLBACK must not mask the original error
+                with contextlib.suppress(sqlite3.Error):
+                    if conn.in_transaction:
+                        conn.execute("ROLLBACK")
+                raise
+            _maybe_truncate_wal(conn)
+            return result
+        finally:
+            conn.close()
+    return _retry(_attempt)
+
+def _read(sql: str, params: tuple = ()) -> List[sqlite3.Row]:
+    """Run a SELECT and fetch all rows, retrying if the DB is busy."""
+    def _attempt() -> List[sqlite3.Row]:
+        conn = _connect()
+        try:
+            return conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+    return _retry(_attempt)
+
+def checkpoint(mode: str = "PASSIVE") -> Tuple[int, int, int]:
+    """Checkpoint the WAL into the main DB file.
+
+    Returns (busy, wal_frames, checkpointed_frames) as reported by SQLite.
+    """
+    mode = mode.upper()
+    if mode not in CHECKPOINT_MODES:
+        raise ValueError(f"mode must be one of {', '.join(CHECKPOINT_MODES)}")
+    # connecting would silently create an empty, uninitialised DB
+    if not DB_PATH.exists():
+        raise FileNotFoundError(f"{DB_PATH} does not exist; run 'init' first")
+    conn = _connect()
+    try:
+        busy, log, done = conn.execute(f"PRAGMA wal_checkpoint({mode});").fetchone()
+    finally:
+        conn.close()
+    if log == -1:
+        raise RuntimeError(f"{DB_PATH} is not in WAL mode; nothing to checkpoint")
+    return busy, log, done
+
 def init_db() -> None:
     conn = _connect()
     try:
+        # WAL is persisted in the DB file, so it only needs setting once
+        conn.execute("PRAGMA journal_mode = WAL;")
         conn.executescript(
             """
             CREATE TABLE IF NOT EXISTS expenses (
@@ -36,150 +145,125 @@ def init_db() -> None:
     finally:
         conn.close()
 
+def _insert_expense(conn: sqlite3.Connection, name: str, amount: float,
+                    category: str, note: str, date: str) -> int:
+    cur = conn.execute(
+        "INSERT INTO expenses (name, amount, category, note, date) VALUES (?, ?, ?, ?, ?)",
+        (name, amount, category, note, date),
+    )
+    return cur.lastrowid
+
+def _update_expense(conn: sqlite3.Connection, expense_id: int, name: str, amount: float,
+                    category: str, note: str, date: str) -> int:
+    cur = conn.execute(
+        """
+        UPDATE expenses
+           SET name = ?, amount = ?, category = ?, note = ?, date = ?
+         WHERE expense_id = ?
+        """,
+        (name, amount, category, note, date, expense_id),
+    )
+    return cur.rowcount
+
 def add_expense(name: str, amount: float, category: str, note: str, date: str) -> int:
-    conn = _connect()
-    try:
-        cur = conn.execute(
-            "INSERT INTO expenses (name, amount, category, note, date) VALUES (?, ?, ?, ?, ?)",
-            (name, amount, category, note, date),
-        )
-        conn.commit()
-        return cur.lastrowid
-    finally:
-        conn.close()
+    return _write(lambda conn: _insert_expense(conn, name, amount, category, note, date))
 
 def update_expense(expense_id: int, name: str, amount: float,
                    category: str, note: str, date: str) -> int:
-    conn = _connect()
-    try:
-        cur = conn.execute(
-            """
-            UPDATE expenses
-               SET name = ?, amount = ?, category = ?, note = ?, date = ?
-             WHERE expense_id = ?
-            """,
-            (name, amount, category, note, date, expense_id),
-        )
-        conn.commit()
-        return cur.rowcount
-    finally:
-        conn.close()
+    return _write(
+        lambda conn: _update_expense(conn, expense_id, name, amount, category, note, date)
+    )
+
+def import_expenses(rows: List[Dict[str, Any]], upsert: bool = False) -> Tuple[int, int]:
+    """Insert (or upsert by expense_id) many rows in a single write transaction.
+
+    Rows need name, amount, category, note and date; expense_id is optional.
+    Returns (inserted, updated).
+    """
+    def _import(conn: sqlite3.Connection) -> Tuple[int, int]:
+        inserted = updated = 0
+        for r in rows:
+            eid = r.get("expense_id")
+            # existence check and update share the transaction, so no other
+            # process can change the row in between
+            if upsert and eid is not None and _update_expense(
+                conn, eid, r["name"], r["amount"], r["category"], r["note"], r["date"]
+            ):
+                updated += 1
+                continue
+            _insert_expense(conn, r["name"], r["amount"], r["category"], r["note"], r["date"])
+            inserted += 1
+        return inserted, updated
+    return _write(_import)
 
 def delete_expenses_by(
     *, expense_id: Optional[int] = None, name: Optional[str] = None, date: Optional[str] = None
 ) -> int:
-    conn = _connect()
-    try:
-        if expense_id is not None:
-            cur = conn.execute("DELETE FROM expenses WHERE expense_id = ?", (expense_id,))
-        elif name is not None:
-            cur = conn.execute("DELETE FROM expenses WHERE name = ?", (name,))
-        elif date is not None:
-            cur = conn.execute("DELETE FROM expenses WHERE date = ?", (date,))
-        else:
-            raise ValueError("Provide expense_id OR name OR date")
-        conn.commit()
-        return cur.rowcount
-    finally:
-        conn.close()
+    if expense_id is not None:
+        sql, params = "DELETE FROM expenses WHERE expense_id = ?", (expense_id,)
+    elif name is not None:
+        sql, params = "DELETE FROM expenses WHERE name = ?", (name,)
+    elif date is not None:
+        sql, params = "DELETE FROM expenses WHERE date = ?", (date,)
+    else:
+        raise ValueError("Provide expense_id OR name OR date")
+    return _write(lambda conn: conn.execute(sql, params).rowcount)
 
 def get_all_expenses() -> List[Dict[str, Any]]:
-    conn = _connect()
-    try:
-        rows = conn.execute(
-            "SELECT * FROM expenses ORDER BY date DESC, expense_id DESC"
-        ).fetchall()
-        return [dict(r) for r in rows]
-    finally:
-        conn.close()
+    rows = _read(
+        "SELECT * FROM expenses ORDER BY date DESC, expense_id DESC"
+    )
+    return [dict(r) for r in rows]
 
 def get_expense_by_id(expense_id: int) -> Optional[Dict[str, Any]]:
-    conn = _connect()
-    try:
-        row = conn.execute(
-            "SELECT * FROM expenses WHERE expense_id = ?", (expense_id,)
-        ).fetchone()
-        return dict(row) if row else None
-    finally:
-        conn.close()
+    rows = _read("SELECT * FROM expenses WHERE expense_id = ?", (expense_id,))
+    return dict(rows[0]) if rows else None
 
 def get_expenses_by_date(date: str) -> List[Dict[str, Any]]:
-    conn = _connect()
-    try:
-        rows = conn.execute(
-            "SELECT * FROM expenses WHERE date = ? ORDER BY expense_id DESC", (date,)
-        ).fetchall()
-        return [dict(r) for r in rows]
-    finally:
-        conn.close()
+    rows = _read(
+        "SELECT * FROM expenses WHERE date = ? ORDER BY expense_id DESC", (date,)
+    )
+    return [dict(r) for r in rows]
 
 def get_expenses_by_category(category: str) -> List[Dict[str, Any]]:
-    conn = _connect()
-    try:
-        rows = conn.execute(
-            "SELECT * FROM expenses WHERE category = ? ORDER BY date DESC", (category,)
-        ).fetchall()
-        return [dict(r) for r in rows]
-    finally:
-        conn.close()
+    rows = _read(
+        "SELECT * FROM expenses WHERE category = ? ORDER BY date DESC", (category,)
+    )
+    return [dict(r) for r in rows]
 
 def get_expenses_between_dates(start: str, end: str) -> List[Dict[str, Any]]:
-    conn = _connect()
-    try:
-        rows = conn.execute(
-            "SELECT * FROM expenses WHERE date BETWEEN ? AND ? ORDER BY date ASC",
-            (start, end),
-        ).fetchall()
-        return [dict(r) for r in rows]
-    finally:
-        conn.close()
+    rows = _read(
+        "SELECT * FROM expenses WHERE date BETWEEN ? AND ? ORDER BY date ASC",
+        (start, end),
+    )
+    return [dict(r) for r in rows]
 
 def search_expenses(keyword: str) -> List[Dict[str, Any]]:
-    conn = _connect()
-    try:
-        rows = conn.execute(
-            "SELECT * FROM expenses WHERE name LIKE ? ORDER BY date DESC",
-            (f"%{keyword}%",),
-        ).fetchall()
-        return [dict(r) for r in rows]
-    finally:
-        conn.close()
+    rows = _read(
+        "SELECT * FROM expenses WHERE name LIKE ? ORDER BY date DESC",
+        (f"%{keyword}%",),
+    )
+    return [dict(r) for r in rows]
 
 def get_expenses_by_amount_range(min_amt: float, max_amt: float) -> List[Dict[str, Any]]:
-    conn = _connect()
-    try:
-        rows = conn.execute(
-            "SELECT * FROM expenses WHERE amount BETWEEN ? AND ? ORDER BY amount ASC",
-            (min_amt, max_amt),
-        ).fetchall()
-        return [dict(r) for r in rows]
-    finally:
-        conn.close()
+    rows = _read(
+        "SELECT * FROM expenses WHERE amount BETWEEN ? AND ? ORDER BY amount ASC",
+        (min_amt, max_amt),
+    )
+    return [dict(r) for r in rows]
 
 def get_latest_expenses(n: int = 10) -> List[Dict[str, Any]]:
-    conn = _connect()
-    try:
-        rows = conn.execute(
-            "SELECT * FROM expenses ORDER BY date DESC, expense_id DESC LIMIT ?",
-            (n,),
-        ).fetchall()
-        return [dict(r) for r in rows]
-    finally:
-        conn.close()
+    rows = _read(
+        "SELECT * FROM expenses ORDER BY date DESC, expense_id DESC LIMIT ?",
+        (n,),
+    )
+    return [dict(r) for r in rows]
 
 def get_distinct_categories() -> List[str]:
-    conn = _connect()
-    try:
-        rows = conn.execute(
-            "SELECT DISTINCT category FROM expenses ORDER BY category ASC"
-        ).fetchall()
-        return [r["category"] for r in rows]
-    finally:
-        conn.close()
+    rows = _read(
+        "SELECT DISTINCT category FROM expenses ORDER BY category ASC"
+    )
+    return [r["category"] for r in rows]
 
 def get_total_count() -> int:
-    conn = _connect()
-    try:
-        return conn.execute("SELECT COUNT(*) FROM expenses").fetchone()[0]
-    finally:
-        conn.close()
+    return _read("SELECT COUNT(*) FROM expenses")[0][0]
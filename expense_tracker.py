@@ -11,6 +11,7 @@ import database as db
 from utils import parse_amount_and_date, currency
 from analytics import by_category, monthly_summary, total_spent, top_expenses, average_daily
 from csv_io import export_to_csv, import_expenses_from_csv
+from stress import run_stress
 
 
 def _ensure_db():
@@ -24,6 +25,22 @@ app = typer.Typer(help="Expense Tracker")
 console = Console()
 
 
+# Global options (apply to every command)
+@app.callback()
+def main(
+    busy_timeout: int = typer.Option(
+        db.BUSY_TIMEOUT_MS, "--busy-timeout", min=0,
+        help="Milliseconds to wait on a locked database (env: EXPENSES_BUSY_TIMEOUT_MS)",
+    ),
+    wal_limit_mb: float = typer.Option(
+        db.WAL_SIZE_LIMIT / (1024 * 1024), "--wal-limit-mb", min=0,
+        help="Truncate the WAL once it grows past this size, 0 = never (env: EXPENSES_WAL_SIZE_LIMIT, bytes)",
+    ),
+):
+    db.BUSY_TIMEOUT_MS = busy_timeout
+    db.WAL_SIZE_LIMIT = int(wal_limit_mb * 1024 * 1024)
+
+
 # Function to print the rows in the Rich Table
 def _print_rows(rows):
     table = Table(show_header=True, header_style="bold")
@@ -204,6 +221,53 @@ def importcsv(
     inserted, updated = import_expenses_from_csv(path, mode=mode)
     console.print(f":inbox_tray: Inserted [b]{inserted}[/b], Updated [b]{updated}[/b] from [b]{path}[/b].")
 
+@app.command()
+def checkpoint(
+    mode: str = typer.Option("PASSIVE", "--mode", "-m", help="PASSIVE | FULL | RESTART | TRUNCATE"),
+):
+    """Checkpoint the write-ahead log into the main database file."""
+    try:
+        busy, log, done = db.checkpoint(mode)
+    except ValueError as e:
+        raise typer.BadParameter(str(e), param_hint="--mode")
+    except (FileNotFoundError, RuntimeError) as e:
+        console.print(f"[red]Checkpoint failed:[/red] {e}")
+        raise typer.Exit(1)
+    status = "[yellow]partial (database busy)[/yellow]" if busy else "complete"
+    console.print(f":floppy_disk: Checkpoint {status}: {done}/{log} WAL frame(s) written back.")
+
+@app.command()
+def stress(
+    readers: int = typer.Option(4, "--readers", "-r", help="Reader processes"),
+    writers: int = typer.Option(4, "--writers", "-w", help="Writer processes"),
+    duration: float = typer.Option(5.0, "--duration", "-d", help="Seconds to run"),
+    db_path: str = typer.Option(
+        None, "--db",
+        help="New DB file to create and write stress rows into; must not exist (default: throwaway temp DB)",
+    ),
+):
+    """Stress test concurrent readers/writers; reports throughput and tail latency."""
+    try:
+        stats = run_stress(readers, writers, duration, db_path)
+    except FileExistsError as e:
+        raise typer.BadParameter(str(e), param_hint="--db")
+    t = Table(show_header=True, header_style="bold")
+    t.add_column("Role")
+    for col in ("Ops", "Ops/s", "Errors", "p50 ms", "p95 ms", "p99 ms", "Max ms"):
+        t.add_column(col, justify="right")
+    for role, s in stats.items():
+        t.add_row(
+            role,
+            str(s["ops"]),
+            f'{s["ops_per_sec"]:,.1f}',
+            str(s["errors"]),
+            f'{s["p50_ms"]:.2f}',
+            f'{s["p95_ms"]:.2f}',
+            f'{s["p99_ms"]:.2f}',
+            f'{s["max_ms"]:.2f}',
+        )
+    console.print(t)
+
 def _prompt_csv_path(default_name: str) -> str:
     return typer.prompt("CSV File Path", default=default_name)
 
@@ -336,7 +400,8 @@ def menu():
 if __name__ == "__main__":
     import sys
     # If run with no CLI args, open the interactive menu by default
+    # (through app() so the global options/env defaults still apply)
     if len(sys.argv) == 1:
-        menu()
+        app(["menu"])
     else:
         app()
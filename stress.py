@@ -0,0 +1,146 @@
+# stress.py
+# Spawn concurrent reader/writer processes against one DB file and
+# measure throughput + latency under lock contention.
+from __future__ import annotations
+import multiprocessing as mp
+import queue as queue_mod
+import random
+import sqlite3
+import tempfile
+import time
+import traceback
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import database as db
+
+# extra seconds to wait for workers beyond the requested duration
+# (process start-up, retry backoff on the last op)
+RESULT_MARGIN = 30.0
+
+
+def _percentile(sorted_vals: List[float], pct: float) -> float:
+    if not sorted_vals:
+        return 0.0
+    k = min(len(sorted_vals) - 1, int(round(pct / 100 * (len(sorted_vals) - 1))))
+    return sorted_vals[k]
+
+
+def _worker(role: str, db_path: str, busy_timeout_ms: int, duration: float, queue) -> None:
+    latencies: List[float] = []
+    errors = 0
+    failure: Optional[str] = None
+    began = time.perf_counter()
+    try:
+        # each process gets its own module state, so point it at the shared file
+        db.DB_PATH = Path(db_path)
+        db.BUSY_TIMEOUT_MS = busy_timeout_ms
+
+        deadline = began + duration
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                if role == "writer":
+                    db.add_expense("stress", round(random.uniform(1, 100), 2), "Stress", "", "2024-01-01")
+                else:
+                    db.get_latest_expenses(50)
+            except sqlite3.OperationalError:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - start)
+    except BaseException:
+        failure = traceback.format_exc()
+    finally:
+        # always report back, otherwise the parent would wait forever
+        queue.put((role, latencies, errors, time.perf_counter() - began, failure))
+
+
+def _collect(queue, procs: List[mp.Process], timeout: float) -> List[tuple]:
+    # gather one result per worker; stop early if every worker is gone,
+    # since a crashed child (e.g. failed import under spawn) never reports
+    results: List[tuple] = []
+    deadline = time.monotonic() + timeout
+    while len(results) < len(procs) and time.monotonic() < deadline:
+        try:
+            results.append(queue.get(timeout=0.5))
+        except queue_mod.Empty:
+            if not any(p.is_alive() for p in procs):
+                break
+    # workers that exited may still have results in the pipe
+    while len(results) < len(procs):
+        try:
+            results.append(queue.get(timeout=0.5))
+        except queue_mod.Empty:
+            break
+    return results
+
+
+def run_stress(
+    readers: int = 4,
+    writers: int = 4,
+    duration: float = 5.0,
+    db_path: Optional[str] = None,
+) -> Dict[str, Dict[str, float]]:
+    """Run the stress test; returns per-role stats (ops, ops/s, errors, p50/p95/p99/max in ms).
+
+    Uses a throwaway database unless db_path is given. db_path must not exist
+    yet, so the run can never write stress rows into real data.
+    """
+    tmpdir = None
+    if db_path is None:
+        tmpdir = tempfile.TemporaryDirectory()
+        db_path = str(Path(tmpdir.name) / "stress.db")
+    elif Path(db_path).exists():
+        raise FileExistsError(f"{db_path} already exists; pick a new path for the stress DB")
+
+    original_path = db.DB_PATH
+    db.DB_PATH = Path(db_path)
+    try:
+        db.init_db()
+
+        queue = mp.Queue()
+        procs = [
+            mp.Process(target=_worker, args=(role, db_path, db.BUSY_TIMEOUT_MS, duration, queue))
+            for role in ["reader"] * readers + ["writer"] * writers
+        ]
+        for p in procs:
+            p.start()
+        try:
+            results = _collect(queue, procs, duration + RESULT_MARGIN)
+        finally:
+            # one shared deadline for all joins, then kill any stragglers
+            join_deadline = time.monotonic() + RESULT_MARGIN
+            for p in procs:
+                p.join(timeout=max(0.0, join_deadline - time.monotonic()))
+            for p in procs:
+                if p.is_alive():
+                    p.terminate()
+                    p.join()
+
+        failures = [f for *_, f in results if f]
+        if failures:
+            raise RuntimeError(f"stress worker failed:\n{failures[0]}")
+        if len(results) < len(procs):
+            codes = [p.exitcode for p in procs]
+            raise RuntimeError(f"stress worker(s) did not report back (exit codes: {codes})")
+
+        stats: Dict[str, Dict[str, float]] = {}
+        for role in ("reader", "writer"):
+            mine = [r for r in results if r[0] == role]
+            lats = sorted(l for _, ls, *_ in mine for l in ls)
+            errs = sum(e for _, _, e, *_ in mine)
+            stats[role] = {
+                "ops": len(lats),
+                # each worker's rate over the time it actually ran, summed
+                "ops_per_sec": sum(len(ls) / el for _, ls, _, el, _ in mine if el > 0),
+                "errors": errs,
+                "p50_ms": _percentile(lats, 50) * 1000,
+                "p95_ms": _percentile(lats, 95) * 1000,
+                "p99_ms": _percentile(lats, 99) * 1000,
+                "max_ms": (lats[-1] if lats else 0.0) * 1000,
+            }
+        return stats
+    finally:
+        db.DB_PATH = original_path
+        if tmpdir is not None:
+            tmpdir.cleanup()
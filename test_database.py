@@ -0,0 +1,137 @@
+# test_database.py
+from __future__ import annotations
+import sqlite3
+import pytest
+
+import database as db
+from csv_io import import_expenses_from_csv
+
+
+def test_write_retries_on_locked_then_succeeds(tmp_db):
+    calls = []
+
+    def fn(conn):
+        calls.append(1)
+        if len(calls) < 3:
+            raise sqlite3.OperationalError("database is locked")
+        return db._insert_expense(conn, "Coffee", 3.5, "Food", "", "2024-01-01")
+
+    eid = db._write(fn)
+    assert len(calls) == 3
+    assert db.get_expense_by_id(eid)["name"] == "Coffee"
+
+
+def test_write_gives_up_after_retries(tmp_db, monkeypatch):
+    monkeypatch.setattr(db, "BUSY_RETRIES", 2)
+    calls = []
+
+    def fn(conn):
+        calls.append(1)
+        raise sqlite3.OperationalError("database is locked")
+
+    with pytest.raises(sqlite3.OperationalError, match="locked"):
+        db._write(fn)
+    assert len(calls) == 3  # first attempt + 2 retries
+
+
+def test_write_does_not_retry_other_errors(tmp_db):
+    calls = []
+
+    def fn(conn):
+        calls.append(1)
+        raise sqlite3.OperationalError("no such table: nope")
+
+    with pytest.raises(sqlite3.OperationalError):
+        db._write(fn)
+    assert len(calls) == 1
+
+
+def test_write_rolls_back_on_error(tmp_db):
+    def fn(conn):
+        db._insert_expense(conn, "Rent", 900, "Housing", "", "2024-01-01")
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError, match="boom"):
+        db._write(fn)
+    assert db.get_total_count() == 0
+
+
+def test_checkpoint_rejects_bad_mode(tmp_db):
+    with pytest.raises(ValueError):
+        db.checkpoint("bogus")
+
+
+def test_checkpoint_refuses_missing_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "DB_PATH", tmp_path / "missing.db")
+    with pytest.raises(FileNotFoundError):
+        db.checkpoint()
+    assert not db.DB_PATH.exists()
+
+
+def test_checkpoint_reports_non_wal_db(tmp_db):
+    conn = sqlite3.connect(tmp_db)
+    conn.execute("PRAGMA journal_mode = DELETE;")
+    conn.close()
+    with pytest.raises(RuntimeError, match="WAL"):
+        db.checkpoint()
+
+
+def test_write_truncates_wal_past_limit(tmp_db, monkeypatch):
+    monkeypatch.setattr(db, "WAL_SIZE_LIMIT", 1)
+    reader = sqlite3.connect(tmp_db)  # keeps the WAL open, like another process
+    reader.execute("SELECT COUNT(*) FROM expenses").fetchone()
+    try:
+        db.add_expense("Bus", 2, "Travel", "", "2024-01-01")
+        assert db._wal_path().stat().st_size == 0
+    finally:
+        reader.close()
+
+
+def test_checkpoint_accepts_any_case(tmp_db):
+    db.add_expense("Tea", 2, "Food", "", "2024-01-01")
+    busy, _, _ = db.checkpoint("truncate")
+    assert busy == 0
+
+
+def test_csv_upsert_runs_in_one_transaction(tmp_db, tmp_path):
+    keep = db.add_expense("Old", 1, "Misc", "", "2024-01-01")
+    path = tmp_path / "in.csv"
+    path.write_text(
+        "expense_id,name,amount,category,note,date\n"
+        f"{keep},New,2,Misc,,2024-01-02\n"
+        "999,Fresh,3,Misc,,2024-01-03\n"
+        ",Other,4,Misc,,2024-01-04\n",
+        encoding="utf-8",
+    )
+    assert import_expenses_from_csv(str(path), mode="upsert") == (2, 1)
+    assert db.get_expense_by_id(keep)["name"] == "New"
+    assert db.get_total_count() == 3
+
+
+def test_csv_import_is_all_or_nothing(tmp_db, tmp_path):
+    path = tmp_path / "bad.csv"
+    path.write_text(
+        "name,amount,category,date\n"
+        "A,1,Misc,2024-01-01\n"
+        "B,-5,Misc,2024-01-02\n",
+        encoding="utf-8",
+    )
+    with pytest.raises(ValueError):
+        import_expenses_from_csv(str(path))
+    assert db.get_total_count() == 0
+
+
+def test_read_retries_on_locked(tmp_db, monkeypatch):
+    db.add_expense("Lunch", 12, "Food", "", "2024-01-01")
+    real_connect = db._connect
+    attempts = []
+
+    def flaky_connect():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise sqlite3.OperationalError("database is locked")
+        return real_connect()
+
+    monkeypatch.setattr(db, "_connect", flaky_connect)
+    assert [r["name"] for r in db.get_all_expenses()] == ["Lunch"]
+    assert len(attempts) == 2
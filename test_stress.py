@@ -0,0 +1,50 @@
+# test_stress.py
+from __future__ import annotations
+import os
+import time
+import pytest
+
+import stress
+from stress import _percentile, run_stress
+
+
+def _crashing_worker(*args):
+    os._exit(3)  # dies without reporting, like a failed import under spawn
+
+
+def test_percentile_empty():
+    assert _percentile([], 99) == 0.0
+
+
+def test_percentile_single_value():
+    assert _percentile([0.25], 50) == 0.25
+    assert _percentile([0.25], 99) == 0.25
+
+
+def test_percentile_bounds():
+    vals = [float(i) for i in range(1, 101)]
+    assert _percentile(vals, 0) == 1.0
+    assert _percentile(vals, 100) == 100.0
+    assert _percentile(vals, 50) == 51.0
+
+
+def test_stress_refuses_existing_db(tmp_path):
+    existing = tmp_path / "expenses.db"
+    existing.write_bytes(b"")
+    with pytest.raises(FileExistsError):
+        run_stress(1, 1, 0.1, str(existing))
+
+
+def test_stress_reports_both_roles(tmp_path):
+    stats = run_stress(1, 1, 0.3, str(tmp_path / "stress.db"))
+    assert set(stats) == {"reader", "writer"}
+    assert stats["writer"]["ops"] > 0
+    assert stats["writer"]["ops_per_sec"] > 0
+
+
+def test_stress_fails_fast_when_worker_dies(tmp_path, monkeypatch):
+    monkeypatch.setattr(stress, "_worker", _crashing_worker)
+    started = time.monotonic()
+    with pytest.raises(RuntimeError, match="did not report back"):
+        run_stress(1, 1, 0.1, str(tmp_path / "stress.db"))
+    assert time.monotonic() - started < stress.RESULT_MARGIN